@@ -1,7 +1,7 @@
-from json import loads
 from typing import List
 
 from fastapi import Depends, HTTPException, status
+from orjson import loads
 
 from ap_explanation.api.v1.dependencies.ap_parser import (
     DatabaseName,
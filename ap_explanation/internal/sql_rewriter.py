@@ -1,4 +1,5 @@
 import random
+from functools import lru_cache
 
 from sqlglot import parse_one
 from sqlglot.expressions import (
@@ -6,6 +7,7 @@ from sqlglot.expressions import (
     Alias,
     Anonymous,
     Column,
+    Expression,
     Having,
     Literal,
     Select,
@@ -16,6 +18,108 @@ from sqlglot.expressions import (
 from ap_explanation.types.semiring import DbSemiring
 
 
+@lru_cache(maxsize=512)
+def _parse_cached(query: str, dialect: str) -> Expression:
+    """
+    Parse a SQL query, reusing the AST of previously seen queries.
+
+    The returned AST is shared between callers and MUST NOT be mutated, copy it first.
+    """
+    return parse_one(query, dialect=dialect)
+
+
+def _retrieval_call(function: str, mapping_table: str) -> Anonymous:
+    """
+    Build the `function(provenance(), 'mapping_table')` call added to non-aggregate queries.
+    """
+    return Anonymous(
+        this=function,
+        expressions=[
+            Anonymous(this="provenance"),
+            Literal.string(mapping_table),
+        ],
+    )
+
+
+@lru_cache(maxsize=32)
+def _retrieval_call_sql(function: str, mapping_table: str, dialect: str) -> str:
+    """
+    Render the `function(provenance(), 'mapping_table')` call added to non-aggregate queries.
+    """
+    return _retrieval_call(function, mapping_table).sql(dialect=dialect)
+
+
+def _is_identifier_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _find_top_level_from(query: str) -> int | None:
+    """
+    Find the position of the FROM keyword of the outermost SELECT in a SQL query.
+
+    Parentheses, quoted strings and identifiers and comments are skipped over, as is
+    the FROM of `IS [NOT] DISTINCT FROM`.
+
+    Returns:
+        int | None: Index of the FROM keyword, or None if there is none, the text holds more
+                    than one statement, or the query uses constructs the scanner doesn't
+                    handle (dollar quoting, backslash escapes)
+    """
+    depth = 0
+    i = 0
+    n = len(query)
+    from_pos = None
+    # Last keyword or identifier seen, comments and whitespace don't reset it
+    previous_word = None
+    # Whether a top-level ';' ended the statement, only whitespace and comments may follow
+    statement_ended = False
+    while i < n:
+        char = query[i]
+        if statement_ended and not char.isspace() and not query.startswith(("--", "/*"), i):
+            # Only the first statement is parsed, splicing the text would keep the others
+            return None
+        if char in "'\"":
+            previous_word = None
+            # Doubled quotes are escaped quotes, not the end of the string
+            end = query.find(char, i + 1)
+            while end != -1 and query.startswith(char, end + 1):
+                end = query.find(char, end + 2)
+            if end == -1 or (char == "'" and "\\" in query[i:end]):
+                return None
+            i = end + 1
+        elif query.startswith("--", i):
+            end = query.find("\n", i)
+            i = n if end == -1 else end + 1
+        elif query.startswith("/*", i):
+            end = query.find("*/", i + 2)
+            # Postgres block comments can be nested
+            if end == -1 or "/*" in query[i + 2:end]:
+                return None
+            i = end + 2
+        elif char == "$":
+            return None
+        elif _is_identifier_char(char):
+            end = i + 1
+            while end < n and _is_identifier_char(query[end]):
+                end += 1
+            word = query[i:end].lower()
+            if depth == 0 and from_pos is None and word == "from" and previous_word != "distinct":
+                from_pos = i
+            previous_word = word
+            i = end
+        else:
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            elif char == ";" and depth == 0:
+                statement_ended = True
+            if not char.isspace():
+                previous_word = None
+            i += 1
+    return from_pos
+
+
 class SqlRewriter:
 
     # SQL flavor to use for parsing and generating SQL queries
@@ -31,6 +135,9 @@ class SqlRewriter:
         """
         Rewrite a SQL query to return the provenance explanation.
 
+        Rewriting is a pure function of the query and semiring, results are
+        memoized across all rewriter instances (see `_rewrite`).
+
         The rewriting rules are as follows:
         - Only SELECT queries are supported
         - HAVING operators are not supported yet
@@ -53,16 +160,23 @@ class SqlRewriter:
             NotImplementedError: If the query uses HAVING or the semiring doesn't 
                                 support aggregate queries
         """
-        ast = parse_one(query, dialect=self.db_dialect)
+        return _rewrite_cached(type(self), query.strip(), semiring)
+
+    def _rewrite(self, query: str, semiring: DbSemiring) -> str:
+        """
+        Uncached implementation of `rewrite`.
+        """
+        ast = _parse_cached(query, self.db_dialect)
 
-        outer_select = ast.find(Select)
+        # Plain SELECT queries are their own outer select, no need to walk the tree for it
+        outer_select = ast if isinstance(ast, Select) else ast.find(Select)
         if outer_select is None:
             raise ValueError("Expected SELECT query")
 
         # Note : HAVING detection is done on the outer select only
         # I honestly don't know if having can appear in subqueries without breaking the provenance logic
         # TODO: Circle back on this
-        if any(outer_select.find_all(Having)):
+        if outer_select.find(Having) is not None:
             raise NotImplementedError(
                 "HAVING queries are not supported yet, rewrite your SQL with nested SELECTs."
             )
@@ -70,7 +184,7 @@ class SqlRewriter:
         # Detect if the outer select contains top-level aggregates (not in subqueries)
         # AND has a GROUP BY clause (required for provsql aggregate provenance tracking)
         if not self._has_top_level_aggregates(outer_select) or not outer_select.args.get('group'):
-            return self._rewrite_non_aggregate(query, semiring)
+            return self._rewrite_non_aggregate(query, ast, semiring)
 
         if semiring.aggregate_function is None:
             from ap_explanation.errors import SemiringOperationNotSupportedError
@@ -79,7 +193,7 @@ class SqlRewriter:
                 operation="aggregate queries"
             )
 
-        return self._rewrite_aggregate(query, semiring)
+        return self._rewrite_aggregate(ast.copy(), semiring)
 
     def _has_top_level_aggregates(self, select: Select) -> bool:
         """
@@ -122,10 +236,14 @@ class SqlRewriter:
 
         return False
 
-    def _rewrite_non_aggregate(self, query: str, semiring: DbSemiring) -> str:
+    def _rewrite_non_aggregate(self, query: str, ast: Expression, semiring: DbSemiring) -> str:
         """
         Rewrite a non-aggregate SELECT query by adding whyPROV_now to the select list.
 
+        The call is spliced in the query text before the outermost FROM, which avoids
+        rendering the AST back to SQL. The AST is only modified and rendered when the
+        FROM can't be located in the text.
+
         Example:
             Original query:
             SELECT col1, col2
@@ -139,6 +257,7 @@ class SqlRewriter:
 
         Args:
             query (str): Original SQL query
+            ast (Expression): Parsed original SQL query, shared and not modified
             semiring (DbSemiring): Semiring configuration for provenance tracking
 
         Returns:
@@ -147,24 +266,24 @@ class SqlRewriter:
         Raises:
             ValueError: If the query is not a SELECT query
         """
-        ast = parse_one(query, dialect=self.db_dialect)
-
         if not isinstance(ast, Select):
             raise ValueError("Expected SELECT query")
 
+        retrieval_call = _retrieval_call_sql(
+            semiring.retrieval_function, semiring.mapping_table, self.db_dialect)
+        # SELECT ... INTO has no column list left once the call is spliced before FROM
+        from_pos = None if ast.args.get("into") else _find_top_level_from(query)
+        if from_pos is not None:
+            return f"{query[:from_pos]}, {retrieval_call} {query[from_pos:]}"
+
+        ast = ast.copy()
         ast.expressions.append(
-            Anonymous(
-                this=semiring.retrieval_function,
-                expressions=[
-                    Anonymous(this="provenance"),
-                    Literal.string(semiring.mapping_table),
-                ],
-            )
+            _retrieval_call(semiring.retrieval_function, semiring.mapping_table)
         )
 
         return ast.sql(dialect=self.db_dialect)
 
-    def _rewrite_aggregate(self, query: str, semiring: DbSemiring) -> str:
+    def _rewrite_aggregate(self, ast: Expression, semiring: DbSemiring) -> str:
         """
         Rewrite an aggregate SELECT query by wrapping it as a subquery and adding
         aggregation_formula on the outer select.
@@ -184,7 +303,7 @@ class SqlRewriter:
             ) AS x;
 
         Args:
-            query (str): Original SQL query
+            ast (Expression): Parsed original SQL query, modified in place
             semiring (DbSemiring): Semiring configuration for provenance tracking
 
         Returns:
@@ -193,8 +312,6 @@ class SqlRewriter:
         Raises:
             ValueError: If the query is not a SELECT query or has no aggregates
         """
-        ast = parse_one(query, dialect=self.db_dialect)
-
         initial_select = ast.find(Select)
         if initial_select is None:
             raise ValueError("Expected query to be a SELECT query")
@@ -211,7 +328,7 @@ class SqlRewriter:
                     alias_name = f"agg_result_{alias_counter}"
                     alias_counter += 1
                     # Replace the expression with an aliased version
-                    aliased_expr = alias_(e, alias_name)
+                    aliased_expr = alias_(e, alias_name, copy=False)
                     initial_select.expressions[i] = aliased_expr
                     proj_agg.append(aliased_expr)
                 else:
@@ -245,6 +362,17 @@ class SqlRewriter:
             )
         )
 
-        wrapper = Select(expressions=outer_columns).from_(subquery)
+        wrapper = Select(expressions=outer_columns).from_(subquery, copy=False)
 
         return wrapper.sql(dialect=self.db_dialect)
+
+
+@lru_cache(maxsize=1024)
+def _rewrite_cached(rewriter: type[SqlRewriter], query: str, semiring: DbSemiring) -> str:
+    """
+    Memoized `SqlRewriter._rewrite`.
+
+    A rewriter is created for every request, so the cache lives at module scope
+    and is keyed on the rewriter class instead of the instance.
+    """
+    return rewriter()._rewrite(query, semiring)
@@ -1,8 +1,11 @@
-from re import compile, search
+from re import compile
 from typing import List, Tuple, TypedDict
 
 from .mapping import ProvenanceMapping
 
+# Matches each '{table_name@p<page>r<row>}' entry of a provenance equation
+_EQUATION_ENTRY_RE = compile(r'\{([^{}@]+)@p(\d+)r(\d+)\}')
+
 
 class RowCtid(TypedDict):
     # Table name
@@ -26,13 +29,13 @@ class CtidMapping(ProvenanceMapping[RowCtid]):
             raise ValueError(f"Invalid provenance format: {value}")
 
         table_name, ctid_part = value.split('@', 1)
-        match = search(r'p(\d+)r(\d+)', ctid_part)
 
-        if not match:
+        # The format is strictly p<page>r<row>, no need for a regex
+        r_pos = ctid_part.find('r', 1)
+        page, row = ctid_part[1:r_pos], ctid_part[r_pos + 1:]
+        if not ctid_part.startswith('p') or r_pos == -1 or not page.isdecimal() or not row.isdecimal():
             raise ValueError(f"Invalid ctid format in: {value}")
 
-        page, row = match.groups()
-
         return {
             "table": table_name,
             "page": int(page),
@@ -48,12 +51,11 @@ class CtidMapping(ProvenanceMapping[RowCtid]):
         Returns:
             A list of RowCtid dictionaries.
         """
-        reg = compile(r'\{([^{}@]+)@p(\d+)r(\d+)\}')
         return [
             {
                 "table": table,
                 "page": int(p),
                 "row": int(r),
             }
-            for table, p, r in reg.findall(values)
+            for table, p, r in _EQUATION_ENTRY_RE.findall(values)
         ]
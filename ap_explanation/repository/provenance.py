@@ -3,10 +3,12 @@ from logging import getLogger
 from typing import Any, LiteralString, cast
 
 from orjson import dumps
-from psycopg import AsyncConnection, errors
-from psycopg.rows import dict_row
+from psycopg import AsyncConnection, AsyncCursor, errors
+from psycopg.pq import TransactionStatus
+from psycopg.rows import tuple_row
 from psycopg.sql import SQL, Identifier
 from psycopg.types.json import set_json_dumps
+from psycopg.types.string import TextLoader
 
 from ap_explanation.errors import ProvSqlInternalError, ProvSqlMissingError
 from ap_explanation.internal.sql_rewriter import SqlRewriter
@@ -24,6 +26,10 @@ class ProvenanceRepository:
     """
     _conn: AsyncConnection
     _sql_rewriter: SqlRewriter
+    # Whether ProvSQL routines may have left a tmp_provsql table behind in this session
+    _tmp_provsql_dirty: bool
+    # Schema the session search path is known to be set to, if any
+    _search_path: str | None
 
     def __init__(
         self,
@@ -32,6 +38,9 @@ class ProvenanceRepository:
     ):
         self._conn = conn
         self._sql_rewriter = sql_rewriter
+        # A repository is built per connection checkout, so the session starts clean
+        self._tmp_provsql_dirty = False
+        self._search_path = None
 
     async def query(self, schema_name: str, query: str, semiring: DbSemiring) -> list[dict[str, Any]]:
         """
@@ -43,20 +52,39 @@ class ProvenanceRepository:
 
         try:
             async with self._conn.transaction():
-                await self._set_search_path(schema_name)
-
                 # Fetch the provenance-annotated results
-                cursor = await self._conn.cursor(row_factory=dict_row).execute(SQL(cast(LiteralString, edited_query)))
+                # NOTE: The rows are not aggregated to JSON server-side (json_agg): they are
+                # enriched with the referenced source rows below, and wrapping the query in an
+                # aggregate would make ProvSQL track the aggregate's provenance instead.
+                # The search path and the query are pipelined to be sent in a single round-trip
+                async with self._conn.pipeline():
+                    await self._set_search_path(schema_name)
+                    cursor = self._json_cursor()
+                    await cursor.execute(SQL(cast(LiteralString, edited_query)))
                 rows = await cursor.fetchall()
+                columns = [column.name for column in (cursor.description or [])]
 
-                # From each row, retrieve the provenance data
-                for row in rows:
+                # Retrieve the provenance data of all rows at once
+                results: list[dict[str, Any]] = []
+                if rows:
+                    # Last occurrence wins on duplicated names, as in the result dictionaries
+                    column_index = {name: i for i, name in enumerate(columns)}
                     retrieval_name = semiring.retrieval_function
-                    if semiring.aggregate_function is not None and semiring.aggregate_function in row:
+                    if semiring.aggregate_function is not None and semiring.aggregate_function in column_index:
                         retrieval_name = semiring.aggregate_function
-                    row[semiring.name] = await self._fetch_related_data(row[retrieval_name], semiring)
+                    retrieval_index = column_index[retrieval_name]
+
+                    related_data = await self._fetch_related_data(
+                        [row[retrieval_index] for row in rows], semiring)
+
+                    # Build each result dictionary in one go, provenance data included
+                    columns.append(semiring.name)
+                    results = [
+                        dict(zip(columns, (*row, data)))
+                        for row, data in zip(rows, related_data)
+                    ]
 
-            return rows
+            return results
         except errors.UndefinedTable as e:
             # The mapping table doesn't exist, meaning the table hasn't been annotated
             from ap_explanation.errors import TableNotAnnotatedError
@@ -86,7 +114,8 @@ class ProvenanceRepository:
         await self._set_search_path(schema_name)
         newly_annotated = True
         try:
-            async with self._conn.transaction():
+            # Both statements are pipelined, errors are raised when the pipeline syncs
+            async with self._conn.pipeline(), self._conn.transaction():
                 await self._conn.execute("CREATE EXTENSION IF NOT EXISTS provsql CASCADE")
                 await self._conn.execute("SELECT add_provenance(%s)", (table_name,))
         except (errors.UndefinedFile, errors.FeatureNotSupported) as e:
@@ -198,11 +227,14 @@ class ProvenanceRepository:
 
         # Drop any existing temp table from previous operations
         # ProvSQl can leave temp tables behind if an error occurs
-        async with self._conn.transaction():
-            try:
-                await self._conn.execute("DROP TABLE IF EXISTS tmp_provsql")
-            except Exception:
-                pass
+        # Skipped when no ProvSQL routine ran in this session yet
+        if self._tmp_provsql_dirty:
+            async with self._conn.transaction():
+                try:
+                    await self._conn.execute("DROP TABLE IF EXISTS tmp_provsql")
+                except Exception:
+                    pass
+            self._tmp_provsql_dirty = False
 
         # Attempt to create the semiring's provenance mapping table.
         # If it already exists, the semiring is already active.
@@ -210,6 +242,8 @@ class ProvenanceRepository:
         semiring_created = True
         try:
             async with self._conn.transaction():
+                # Mark before the call: a failing routine is what leaves tmp_provsql behind
+                self._tmp_provsql_dirty = True
                 await self._conn.execute(
                     "SELECT create_provenance_mapping(%s, %s, %s)",
                     (prov_table, table_name,
@@ -279,7 +313,8 @@ class ProvenanceRepository:
         await self._set_search_path(schema_name)
 
         # Workaround for https://github.com/PierreSenellart/provsql/issues/68
-        async with self._conn.transaction():
+        # The triggers are dropped in a single round-trip
+        async with self._conn.pipeline(), self._conn.transaction():
             drop_insert_trigger = SQL("DROP TRIGGER IF EXISTS insert_statement ON {} CASCADE").format(
                 Identifier(table_name))
             drop_delete_trigger = SQL("DROP TRIGGER IF EXISTS delete_statement ON {} CASCADE").format(
@@ -305,9 +340,15 @@ class ProvenanceRepository:
         """
         await self._set_search_path(schema_name)
 
-        cursor = await self._conn.cursor(row_factory=dict_row).execute(
-            "SELECT tablename FROM pg_catalog.pg_tables WHERE schemaname = %s AND tablename LIKE %s",
-            (schema_name, f"%{semiring.table_suffix}")
+        # Query the catalog directly rather than through the pg_tables view,
+        # '_' is escaped so it is not a LIKE wildcard
+        cursor = await self._conn.cursor(row_factory=tuple_row).execute(
+            """
+            SELECT c.relname FROM pg_catalog.pg_class c
+            JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s AND c.relkind IN ('r', 'p') AND c.relname LIKE %s
+            """,
+            (schema_name, "%" + semiring.table_suffix.replace("_", "\\_"))
         )
         provwhy_tables = await cursor.fetchall()
 
@@ -321,70 +362,120 @@ class ProvenanceRepository:
         qualified_name = SQL("{}.{}").format(
             Identifier(schema_name), Identifier(name))
 
-        await self._conn.execute(SQL("DROP TABLE IF EXISTS {} CASCADE").format(qualified_name))
-
         # Build union query with schema-qualified table names
-        union_query = " UNION ".join([
-            f"SELECT * FROM {schema_name}.{row['tablename']}" for row in provwhy_tables
+        # Each mapping table holds the distinct provenance tokens of its own base table,
+        # the union cannot contain duplicates so skip the deduplication pass
+        union_query = SQL(" UNION ALL ").join([
+            SQL("SELECT * FROM {}.{}").format(Identifier(schema_name), Identifier(row[0]))
+            for row in provwhy_tables
         ])
-        composed_rq = SQL("CREATE TABLE {} AS {}").format(
+        # Adjust the value column to be an Array while copying the rows,
+        # rather than rewriting the whole table afterwards
+        # NOTE : This may be semiring specific, should be abstracted
+        composed_rq = SQL(
+            "CREATE TABLE {} AS SELECT ('{{\"{{' || value::text || '}}\"}}')::varchar AS value, provenance FROM ({}) AS mappings"
+        ).format(
             qualified_name,
-            SQL(cast(LiteralString, union_query))
+            union_query
         )
-        await self._conn.execute(composed_rq)
 
-        # Adjust the value column to be an Array and add primary key
-        # NOTE : This may be semiring specific, should be abstracted
-        await self._conn.execute(SQL("ALTER TABLE {} ALTER COLUMN value TYPE varchar").format(qualified_name))
-        await self._conn.execute(SQL("UPDATE {} SET value = '{{\"{{' || value || '}}\"}}'").format(qualified_name))
-        await self._conn.execute(SQL("ALTER TABLE {} ADD PRIMARY KEY (provenance)").format(qualified_name))
+        # The DDL statements don't return anything, send them in a single round-trip
+        async with self._conn.pipeline():
+            await self._conn.execute(SQL("DROP TABLE IF EXISTS {} CASCADE").format(qualified_name))
+            await self._conn.execute(composed_rq)
+            await self._conn.execute(SQL("ALTER TABLE {} ADD PRIMARY KEY (provenance)").format(qualified_name))
 
         logger.info(
             f"Created {schema_name}.{name} table from {len(provwhy_tables)} {semiring.table_suffix} tables")
         return True
 
     async def _set_search_path(self, schema_name: str) -> None:
-        """Set the PostgreSQL search path for the current connection."""
+        """
+        Set the PostgreSQL search path for the current connection.
+
+        The statement is skipped when the session already uses this schema. A search path
+        set inside a transaction is reverted on rollback, so it is only remembered once
+        committed (i.e. when set outside of any transaction in autocommit mode).
+        """
+        if self._search_path == schema_name:
+            return
+
         query = SQL("SET search_path TO {}, public, provsql;").format(
             Identifier(schema_name)
         )
         await self._conn.execute(query)
 
-    async def _fetch_related_data(self, provenance: str, semiring: DbSemiring) -> list[dict]:
-        matches = semiring.mappingStrategy.decode_equation(provenance)
+        if self._conn.info.transaction_status == TransactionStatus.IDLE:
+            self._search_path = schema_name
+        else:
+            self._search_path = None
 
-        # Group by table
-        table_groups = defaultdict(list)
-        for row in matches:
-            table_groups[row['table']].append(row)
+    def _json_cursor(self) -> AsyncCursor[tuple[Any, ...]]:
+        """
+        Create a cursor for results that are only ever serialized to JSON.
 
-        results = []
+        Provenance tokens (UUIDs) are loaded straight as strings instead of building
+        uuid.UUID objects per cell. The loader is registered on the cursor only, the
+        connection is not owned by the repository.
+        """
+        cursor = self._conn.cursor(row_factory=tuple_row)
+        cursor.adapters.register_loader("uuid", TextLoader)
+        return cursor
 
-        # Query each table for the relevant rows
-        for table, rows in table_groups.items():
-            ctids = [f"({r['page']},{r['row']})" for r in rows]
+    async def _fetch_related_data(self, provenances: list[str], semiring: DbSemiring) -> list[list[dict]]:
+        """
+        Fetch the source rows referenced by each provenance value.
 
+        Each referenced table is queried once for the whole result set,
+        rather than once per result row.
+
+        Args:
+            provenances: The provenance values of the result rows.
+            semiring: The semiring the provenance values were computed with.
+        Returns:
+            For each provenance value, the list of referenced rows.
+        """
+        # Group by table for each result row, keeping the order of the row's own equation,
+        # and gather the tuples to fetch from each table across all result rows
+        row_groups: list[dict[str, list[tuple[dict, str]]]] = []
+        ctids_by_table: dict[str, dict[str, None]] = defaultdict(dict)
+        for provenance in provenances:
+            table_groups = defaultdict(list)
+            for match in semiring.mappingStrategy.decode_equation(provenance):
+                ctid = "({},{})".format(match['page'], match['row'])
+                table_groups[match['table']].append((match, ctid))
+                # The same tuple is often referenced several times, only ask for it once
+                ctids_by_table[match['table']][ctid] = None
+            row_groups.append(table_groups)
+
+        # Query each table once for the rows referenced by the whole result set
+        data_by_table: dict[str, tuple[list[str], dict[str, tuple]]] = {}
+        for table, ctids in ctids_by_table.items():
+            # ctid comes first, as text, so the remaining columns are the table's own
             query = (
-                SQL("SELECT *, ctid FROM {} WHERE ctid = ANY(%s)")
+                SQL("SELECT ctid::text, * FROM {} WHERE ctid = ANY(%s)")
                 .format(Identifier(table))
             )
-            cursor = await self._conn.cursor(row_factory=dict_row).execute(query, (ctids,))
-            data_by_ctid = {
-                str(r['ctid']): r for r in await cursor.fetchall()
-            }
-
-            for r in rows:
-                ctid = f"({r['page']},{r['row']})"
-                if row := data_by_ctid.get(ctid):
-                    row = dict(row)
-                    row.pop('ctid', None)
-
-                    results.append({
-                        "reference": f"{table}@p{r['page']}r{r['row']}",
-                        "data": row,
-                    })
-                else:
-                    logger.warning(
-                        "No data found for %s with ctid %s", table, ctid)
+            cursor = await self._json_cursor().execute(query, (list(ctids),))
+            columns = [column.name for column in (cursor.description or [])[1:]]
+            data_by_table[table] = (columns, {
+                r[0]: r for r in await cursor.fetchall()
+            })
+
+        results: list[list[dict]] = []
+        for table_groups in row_groups:
+            row_results = []
+            for table, matches in table_groups.items():
+                columns, data_by_ctid = data_by_table[table]
+                for match, ctid in matches:
+                    if row := data_by_ctid.get(ctid):
+                        row_results.append({
+                            "reference": f"{table}@p{match['page']}r{match['row']}",
+                            "data": dict(zip(columns, row[1:])),
+                        })
+                    else:
+                        logger.warning(
+                            "No data found for %s with ctid %s", table, ctid)
+            results.append(row_results)
 
         return results
@@ -1,6 +1,7 @@
-from typing import Any, Dict, List, Optional
+from collections import defaultdict
+from typing import Any, Dict, List, Mapping, Optional, Self, Tuple
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 
 class PgJsonNode(BaseModel):
@@ -24,17 +25,60 @@ class PgJsonEdge(BaseModel):
 
 
 class PgJson(BaseModel):
-    nodes: List[PgJsonNode]
-    edges: List[PgJsonEdge]
+    """
+    Property graph of an analytical pattern.
+
+    The graph is frozen once parsed, lookups go through indexes built along with it.
+    Its nodes and edges must not be modified in place, `model_copy(update=...)` rebuilds the indexes.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    nodes: Tuple[PgJsonNode, ...]
+    edges: Tuple[PgJsonEdge, ...]
+
+    _nodes_by_id: Dict[str, PgJsonNode] = PrivateAttr(default_factory=dict)
+    _edges_by_from: Dict[str, List[PgJsonEdge]] = PrivateAttr(default_factory=dict)
+    _edges_by_to: Dict[str, List[PgJsonEdge]] = PrivateAttr(default_factory=dict)
+    _nodes_by_label: Dict[str, List[PgJsonNode]] = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, context: Any) -> None:
+        self._build_indexes()
+
+    def model_copy(self, *, update: Mapping[str, Any] | None = None, deep: bool = False) -> Self:
+        copied = super().model_copy(update=update, deep=deep)
+        # The indexes are copied along, they must follow the updated nodes and edges
+        copied._build_indexes()
+        return copied
+
+    def _build_indexes(self) -> None:
+        nodes_by_id: Dict[str, PgJsonNode] = {}
+        nodes_by_label: Dict[str, List[PgJsonNode]] = defaultdict(list)
+        for n in self.nodes:
+            # Keep the first node for duplicated ids, like a linear scan would
+            nodes_by_id.setdefault(n.id, n)
+            # A node listing the same label twice is still returned once
+            for label in dict.fromkeys(n.labels):
+                nodes_by_label[label].append(n)
+
+        edges_by_from: Dict[str, List[PgJsonEdge]] = defaultdict(list)
+        edges_by_to: Dict[str, List[PgJsonEdge]] = defaultdict(list)
+        for e in self.edges:
+            edges_by_from[e.from_].append(e)
+            edges_by_to[e.to].append(e)
+
+        self._nodes_by_id = nodes_by_id
+        self._nodes_by_label = nodes_by_label
+        self._edges_by_from = edges_by_from
+        self._edges_by_to = edges_by_to
 
     def get_node_by_id(self, node_id: str) -> Optional[PgJsonNode]:
-        return next((n for n in self.nodes if n.id == node_id), None)
+        return self._nodes_by_id.get(node_id)
 
     def get_edges_from(self, node_id: str) -> List[PgJsonEdge]:
-        return [e for e in self.edges if e.from_ == node_id]
+        return list(self._edges_by_from.get(node_id, ()))
 
     def get_edges_to(self, node_id: str) -> List[PgJsonEdge]:
-        return [e for e in self.edges if e.to == node_id]
+        return list(self._edges_by_to.get(node_id, ()))
 
     def get_nodes_by_label(self, label: str) -> List[PgJsonNode]:
-        return [n for n in self.nodes if label in n.labels]
+        return list(self._nodes_by_label.get(label, ()))
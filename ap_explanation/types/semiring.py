@@ -10,8 +10,9 @@ class DbSemiring(BaseModel):
 
     A semiring defines how provenance information is computed and stored
     in the database. This is a pure data model without database-specific logic.
+    Instances are immutable and hashable, so they can be used as cache keys.
     """
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+    model_config = ConfigDict(arbitrary_types_allowed=True, frozen=True)
 
     # Name of the semiring
     name: str
@@ -0,0 +1,4 @@
+"""JSON helpers for the tests, backed by orjson like the API."""
+from orjson import dumps, loads
+
+__all__ = ["dumps", "loads"]
@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class TestSchema:
+    # Not a test class, despite the name
+    __test__ = False
+
+    table: str = "assessment"
+    schema: str = "mathe"
@@ -1,12 +1,16 @@
-from dataclasses import dataclass
+import asyncio
+import os
+from contextlib import ExitStack
 from pathlib import Path
 from typing import AsyncGenerator, List
 from urllib.parse import urlparse, urlunparse
+from uuid import uuid4
 
 import pytest
 import pytest_asyncio
 from psycopg import AsyncConnection
 from psycopg_pool import AsyncConnectionPool
+from sqlglot import parse_one
 from testcontainers.core.image import DockerImage
 from testcontainers.postgres import PostgresContainer
 
@@ -15,12 +19,16 @@ from ap_explanation.repository.provenance import ProvenanceRepository
 from ap_explanation.semirings import semirings
 from ap_explanation.services.provenance import ProvenanceService
 from ap_explanation.types.semiring import DbSemiring
+from tests._schema import TestSchema
 
+_SEMIRINGS_BY_NAME = {s.name: s for s in semirings}
+_SQL_REWRITER = SqlRewriter()
 
-@dataclass
-class TestSchema:
-    table: str = "assessment"
-    schema: str = "mathe"
+# sqlglot sets up its dialects and parser on first use, do it before any test runs
+parse_one("select 1")
+
+_container_stack_key = pytest.StashKey[ExitStack]()
+_postgres_container_key = pytest.StashKey[PostgresContainer | Exception]()
 
 
 @pytest.fixture(scope="session")
@@ -28,62 +36,170 @@ def test_schema() -> TestSchema:
     return TestSchema()
 
 
-@pytest.fixture(scope="function")
-def postgres_container():
+def _start_postgres_container(stack: ExitStack) -> PostgresContainer:
+    """
+    Builds the Postgres + ProvSQL image with the seed data and starts a container from it.
+    Both are released when `stack` is closed.
+
+    With pytest-xdist, every worker runs its own session and so its own container.
+    """
+    worker_id = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
     # Get the project root directory (parent of tests/)
     project_root = Path(__file__).parent.parent
 
-    with DockerImage(
+    image = stack.enter_context(DockerImage(
         path=str(project_root),
         dockerfile_path="dependencies/postgres-provsql/Dockerfile",
         tag="testdb:latest",
         clean_up=False,
         buildargs={"FIXTURES_PATH": "fixtures/postgres-seed"}
-    ) as image:
-        with PostgresContainer(
-            image=str(image),
-            username="provdemo",
-            password="provdemo",
-            dbname="mathe"
-        ) as postgres:
-            yield postgres
-
-
-@pytest_asyncio.fixture
-async def db_pool(postgres_container: PostgresContainer) -> AsyncGenerator[AsyncConnectionPool]:
-    """Provides a connection to the test database."""
+    ))
+    return stack.enter_context(PostgresContainer(
+        image=str(image),
+        username="provdemo",
+        password="provdemo",
+        dbname="mathe"
+    ).with_name(
+        # Unique per run, other runs may share the Docker daemon
+        f"provdemo-test-{worker_id}-{uuid4().hex[:8]}"
+    ).with_kwargs(
+        # The test database is throwaway: keep its data in memory
+        tmpfs={"/var/lib/postgresql/data": "rw,size=1g"},
+    ).with_command(
+        # config_file must be kept, it is what preloads provsql
+        "postgres -c config_file=/etc/postgresql/postgresql.conf"
+        " -c fsync=off -c synchronous_commit=off -c full_page_writes=off"
+        " -c wal_level=minimal -c max_wal_senders=0"
+        " -c checkpoint_timeout=30min -c shared_buffers=256MB -c jit=off"
+    ))
+
+
+class _ExternalPostgres:
+    """Stands in for the container when the tests run against an already running database."""
+
+    def __init__(self, url: str):
+        self._url = url
+
+    def get_connection_url(self) -> str:
+        return self._url
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]) -> None:
+    """Marks the tests that need the database as integration tests, and the others as unit tests."""
+    for item in items:
+        if "postgres_container" in getattr(item, "fixturenames", ()):
+            item.add_marker(pytest.mark.integration)
+        else:
+            item.add_marker(pytest.mark.unit)
+
+
+def pytest_collection_finish(session: pytest.Session) -> None:
+    """Starts the container once, if any collected test needs it."""
+    if session.config.option.collectonly or os.environ.get("TEST_PG_URL"):
+        return
+    if not any("postgres_container" in getattr(item, "fixturenames", ()) for item in session.items):
+        return
+
+    stack = ExitStack()
+    session.config.stash[_container_stack_key] = stack
+    try:
+        session.config.stash[_postgres_container_key] = _start_postgres_container(stack)
+    except Exception as e:
+        # Reported by the tests that need the container, the others still run
+        session.config.stash[_postgres_container_key] = e
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
+    stack = session.config.stash.get(_container_stack_key, None)
+    if stack is not None:
+        stack.close()
+
+
+@pytest.fixture(scope="session")
+def postgres_container(request: pytest.FixtureRequest) -> PostgresContainer | _ExternalPostgres:
+    """
+    Postgres + ProvSQL container shared by the whole test session, see `pytest_collection_finish`.
+    Each test runs in a transaction that is rolled back, see `db_connection`.
+
+    Set TEST_PG_URL to use an already running database instead.
+    """
+    external_url = os.environ.get("TEST_PG_URL")
+    if external_url:
+        return _ExternalPostgres(external_url)
+
+    container = request.config.stash[_postgres_container_key]
+    if isinstance(container, Exception):
+        raise container
+    return container
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session", autouse=True)
+async def _session_loop() -> asyncio.AbstractEventLoop:
+    """The event loop shared by every async test and fixture of the session."""
+    return asyncio.get_running_loop()
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def db_pool(postgres_container: PostgresContainer | _ExternalPostgres) -> AsyncGenerator[AsyncConnectionPool]:
+    """Provides a connection pool to the test database, shared by the whole test session."""
     qs = postgres_container.get_connection_url()
     parsed = urlparse(qs)
     scheme = parsed.scheme.split("+", 1)[0]  # remove +psycopg2
     qs = urlunparse(parsed._replace(scheme=scheme))
 
+    # All connections are opened upfront and kept for the whole session,
+    # so no test waits on a connection being established
     pool = AsyncConnectionPool(
         conninfo=qs,
-        min_size=1,
+        min_size=5,
         max_size=5,
+        max_lifetime=24 * 60 * 60,
+        open=False,
     )
-    await pool.open()
+    await pool.open(wait=True, timeout=30)
     yield pool  # type: ignore
     await pool.close()
 
 
-@pytest_asyncio.fixture
-async def db_connection(db_pool: AsyncConnectionPool) -> AsyncGenerator[AsyncConnection]:
+@pytest_asyncio.fixture(scope="function", loop_scope="session")
+async def db_connection(
+    db_pool: AsyncConnectionPool, _session_loop: asyncio.AbstractEventLoop
+) -> AsyncGenerator[AsyncConnection]:
     """
     Returns a database connection from the pool.
+
+    Everything the test does runs in a single transaction (the repository's own
+    transactions become savepoints), which is rolled back once the test is done,
+    leaving the database as seeded for the next test.
+    This is cheaper than cloning a template database for each test, which would
+    also require closing every pooled connection to the cloned database first.
     """
+    # The pool's connections only work on the loop they were opened on
+    assert asyncio.get_running_loop() is _session_loop, "db_connection must run on the session event loop"
     async with db_pool.connection() as conn:
         yield conn
+        await conn.rollback()
 
 
-@pytest_asyncio.fixture
-async def provenance_repository(db_connection: AsyncConnection, sql_rewriter: SqlRewriter):
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def _semiring_setup_done(db_pool: AsyncConnectionPool, sql_rewriter: SqlRewriter) -> bool:
+    """
+    Runs the semiring setup once for the whole session.
+    The connection is committed when returned to the pool, so the rollback done after each test keeps it.
+    """
+    async with db_pool.connection() as conn:
+        await ProvenanceRepository(conn, sql_rewriter).ensure_semiring_setup()
+    return True
+
+
+@pytest_asyncio.fixture(scope="function", loop_scope="session")
+async def provenance_repository(
+    db_connection: AsyncConnection, sql_rewriter: SqlRewriter, _semiring_setup_done: bool
+):
     """
     Returns a ProvenanceRepository with semiring setup ensured.
     """
-    repo = ProvenanceRepository(db_connection, sql_rewriter)
-    await repo.ensure_semiring_setup()
-    return repo
+    return ProvenanceRepository(db_connection, sql_rewriter)
 
 
 @pytest.fixture
@@ -92,9 +208,9 @@ def provenance_service(provenance_repository: ProvenanceRepository):
 
 
 @pytest.fixture(scope="session")
-def sql_rewriter():
-    """SQL rewriter for testing query transformations."""
-    return SqlRewriter()
+def sql_rewriter() -> SqlRewriter:
+    """SQL rewriter for testing query transformations, shared by the whole test session."""
+    return _SQL_REWRITER
 
 
 @pytest.fixture(scope="session")
@@ -104,12 +220,12 @@ def all_semirings() -> List[DbSemiring]:
 
 
 @pytest.fixture(scope="session")
-def why_semiring(all_semirings: List[DbSemiring]) -> DbSemiring:
-    """Why provenance semiring configuration for testing."""
-    return next(s for s in all_semirings if s.name == "why")
+def why_semiring() -> DbSemiring:
+    """Why provenance semiring configuration for testing, shared and read-only."""
+    return _SEMIRINGS_BY_NAME["why"]
 
 
 @pytest.fixture(scope="session")
-def formula_semiring(all_semirings: List[DbSemiring]) -> DbSemiring:
-    """How provenance semiring configuration for testing."""
-    return next(s for s in all_semirings if s.name == "formula")
+def formula_semiring() -> DbSemiring:
+    """How provenance semiring configuration for testing, shared and read-only."""
+    return _SEMIRINGS_BY_NAME["formula"]
@@ -0,0 +1,88 @@
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Any, AsyncIterator
+
+from psycopg.pq import TransactionStatus
+
+from ap_explanation.internal.sql_rewriter import SqlRewriter
+from ap_explanation.repository.provenance import ProvenanceRepository
+from ap_explanation.types.semiring import DbSemiring
+
+
+class _FakeCursor:
+    """Returns every requested ctid as a row holding the ctid twice: (ctid::text, value)."""
+
+    def __init__(self):
+        self.adapters = SimpleNamespace(register_loader=lambda *args: None)
+        self.description = None
+        self._rows: list[tuple] = []
+
+    async def execute(self, query: Any, params: Any = None, **kwargs: Any) -> "_FakeCursor":
+        self.description = [SimpleNamespace(name="ctid"), SimpleNamespace(name="value")]
+        # Any other query, such as the mapping tables lookup, finds nothing
+        if params is not None and len(params) == 1 and isinstance(params[0], list):
+            self._rows = [(ctid, ctid) for ctid in params[0]]
+        return self
+
+    async def fetchall(self) -> list[tuple]:
+        return self._rows
+
+
+class _FakeConnection:
+    """
+    Just enough of an AsyncConnection to run the repository without a database.
+    Behaves as in autocommit mode: the session is idle outside of `transaction()` blocks.
+    """
+
+    def __init__(self):
+        self.info = SimpleNamespace(transaction_status=TransactionStatus.IDLE)
+        self.statements: list[str] = []
+
+    def cursor(self, row_factory: Any = None) -> _FakeCursor:
+        return _FakeCursor()
+
+    async def execute(self, query: Any, params: Any = None, **kwargs: Any) -> _FakeCursor:
+        self.statements.append(query if isinstance(query, str) else query.as_string())
+        return _FakeCursor()
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        status = self.info.transaction_status
+        self.info.transaction_status = TransactionStatus.INTRANS
+        try:
+            yield
+        finally:
+            self.info.transaction_status = status
+
+    @asynccontextmanager
+    async def pipeline(self) -> AsyncIterator[None]:
+        yield
+
+
+async def test_related_data_keeps_row_order(why_semiring: DbSemiring):
+    """
+    Tables are queried once for all rows, but each row lists its references in the order of its own equation.
+    """
+    repo = ProvenanceRepository(_FakeConnection(), SqlRewriter())  # type: ignore
+
+    related = await repo._fetch_related_data(
+        ["{a@p1r1} x {b@p2r2}", "{b@p3r3} + {a@p4r4}"], why_semiring)
+
+    assert [[r["reference"] for r in row] for row in related] == [
+        ["a@p1r1", "b@p2r2"],
+        ["b@p3r3", "a@p4r4"],
+    ]
+
+
+async def test_search_path_set_once_in_autocommit(all_semirings: list[DbSemiring]):
+    """
+    Once committed, the search path is kept by the session and is not set again for the same schema.
+    """
+    conn = _FakeConnection()
+    repo = ProvenanceRepository(conn, SqlRewriter())  # type: ignore
+
+    await repo.enable_provenance("mathe", "assessment")
+    for semiring in all_semirings:
+        await repo.add_semiring("mathe", "assessment", semiring)
+
+    assert sum(s.startswith("SET search_path") for s in conn.statements) == 1
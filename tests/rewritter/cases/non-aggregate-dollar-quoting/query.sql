@@ -0,0 +1,4 @@
+-- Dollar quoted strings are not scanned, the call is added through the AST instead of the query text
+SELECT $$from$$ AS label, a.answer
+FROM assessment a
+WHERE a.student_id=80;
@@ -0,0 +1,3 @@
+SELECT a.answer IS DISTINCT FROM -1 AS answered, a.question_id, whyprov_now(provenance(),'why_mapping')
+FROM assessment a
+WHERE a.student_id=80;
@@ -0,0 +1,4 @@
+-- The FROM of IS DISTINCT FROM is not the FROM clause
+SELECT a.answer IS DISTINCT FROM -1 AS answered, a.question_id
+FROM assessment a
+WHERE a.student_id=80;
@@ -0,0 +1,3 @@
+SELECT a.answer, formula(provenance(),'formula_mapping')
+FROM assessment a
+WHERE a.student_id=80;
@@ -0,0 +1,3 @@
+SELECT a.answer, whyprov_now(provenance(),'why_mapping')
+FROM assessment a
+WHERE a.student_id=80;
@@ -0,0 +1,4 @@
+-- Only the first statement is parsed, the ones after it must not be kept in the rewritten query
+SELECT a.answer
+FROM assessment a
+WHERE a.student_id=80; DROP TABLE assessment;
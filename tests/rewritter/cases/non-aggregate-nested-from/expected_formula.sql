@@ -0,0 +1,3 @@
+SELECT EXTRACT(YEAR FROM a.created_at) AS answer_year, 'from' AS "from", a.answer, formula(provenance(),'formula_mapping')
+FROM (SELECT * FROM assessment WHERE student_id=80) a
+WHERE a.question_level>2;
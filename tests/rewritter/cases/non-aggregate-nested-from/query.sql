@@ -0,0 +1,4 @@
+-- FROM keywords nested in function calls, subqueries and literals must be left alone
+SELECT EXTRACT(YEAR FROM a.created_at) AS answer_year, 'from' AS "from", a.answer
+FROM (SELECT * FROM assessment WHERE student_id=80) a
+WHERE a.question_level>2;
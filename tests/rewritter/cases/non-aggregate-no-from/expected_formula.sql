@@ -0,0 +1 @@
+SELECT 1 AS one, formula(provenance(),'formula_mapping');
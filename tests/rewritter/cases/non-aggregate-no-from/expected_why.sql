@@ -0,0 +1 @@
+SELECT 1 AS one, whyprov_now(provenance(),'why_mapping');
@@ -0,0 +1,2 @@
+-- Without a FROM clause the call is added through the AST instead of the query text
+SELECT 1 AS one;
@@ -0,0 +1,4 @@
+SELECT a.answer, formula(provenance(),'formula_mapping')
+INTO answers
+FROM assessment a
+WHERE a.student_id=80;
@@ -0,0 +1,4 @@
+SELECT a.answer, whyprov_now(provenance(),'why_mapping')
+INTO answers
+FROM assessment a
+WHERE a.student_id=80;
@@ -0,0 +1,5 @@
+-- The call belongs to the select list, before INTO
+SELECT a.answer
+INTO answers
+FROM assessment a
+WHERE a.student_id=80;
@@ -6,23 +6,20 @@ import pytest
 from ap_explanation.errors import TableOrSchemaNotFoundError
 from ap_explanation.services.provenance import ProvenanceService
 from ap_explanation.types.semiring import DbSemiring
-from tests.conftest import TestSchema
+from tests._schema import TestSchema
 
 
 ############################
 # CREATE ANNOTATION TESTS #
 ############################
-@pytest.mark.asyncio
 async def test_ok_single_semiring(provenance_service: ProvenanceService, why_semiring: DbSemiring, test_schema: TestSchema):
     await provenance_service.annotate_dataset(test_schema.table, test_schema.schema, [why_semiring])
 
 
-@pytest.mark.asyncio
 async def test_ok_all_semiring(provenance_service: ProvenanceService, all_semirings: List[DbSemiring], test_schema: TestSchema):
     await provenance_service.annotate_dataset(test_schema.table, test_schema.schema, all_semirings)
 
 
-@pytest.mark.asyncio
 async def test_ok_multiple_calls(provenance_service: ProvenanceService, all_semirings: List[DbSemiring], test_schema: TestSchema):
     """
     Annotate the same dataset multiple times with different semirings. This should work without issues.
@@ -31,7 +28,6 @@ async def test_ok_multiple_calls(provenance_service: ProvenanceService, all_semi
         await provenance_service.annotate_dataset(test_schema.table, test_schema.schema, [semiring])
 
 
-@pytest.mark.asyncio
 async def test_ok_idempotency(provenance_service: ProvenanceService, why_semiring: DbSemiring, test_schema: TestSchema):
     """
     Annotating the same dataset multiple times with the same semiring should not be a problem.
@@ -43,7 +39,6 @@ async def test_ok_idempotency(provenance_service: ProvenanceService, why_semirin
     assert newly_annotated is False
 
 
-@pytest.mark.asyncio
 async def test_ko_table_does_not_exists(provenance_service: ProvenanceService, why_semiring: DbSemiring, test_schema: TestSchema):
     with pytest.raises(TableOrSchemaNotFoundError) as exc_info:
         await provenance_service.annotate_dataset("i_dont_exists", test_schema.schema, [why_semiring])
@@ -51,7 +46,6 @@ async def test_ko_table_does_not_exists(provenance_service: ProvenanceService, w
     assert test_schema.schema in str(exc_info.value)
 
 
-@pytest.mark.asyncio
 async def test_ko_schema_does_not_exists(provenance_service: ProvenanceService, why_semiring: DbSemiring, test_schema: TestSchema):
     with pytest.raises(TableOrSchemaNotFoundError) as exc_info:
         await provenance_service.annotate_dataset(test_schema.table, "i_dont_exists", [why_semiring])
@@ -62,7 +56,6 @@ async def test_ko_schema_does_not_exists(provenance_service: ProvenanceService,
 ######################
 
 
-@pytest.mark.asyncio
 async def test_ok_remove_annotation_from_non_annotated_table(provenance_service: ProvenanceService, test_schema: TestSchema):
     was_removed = await provenance_service.remove_annotation(test_schema.table, test_schema.schema)
     # NOTE: Not checked yet as the ability to remove a single semiring has been removed. Effectively everything will be removed and the
@@ -70,7 +63,6 @@ async def test_ok_remove_annotation_from_non_annotated_table(provenance_service:
     # assert was_removed is False
 
 
-@pytest.mark.asyncio
 async def test_ok_reversibility(provenance_service: ProvenanceService, why_semiring: DbSemiring, test_schema: TestSchema):
     """
     Annotation should be reversible: annotating and then removing the annotation should leave the dataset unchanged.
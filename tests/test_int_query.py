@@ -1,6 +1,5 @@
 from typing import List
 
-import orjson
 import pytest
 
 from ap_explanation.errors import (
@@ -9,10 +8,10 @@ from ap_explanation.errors import (
 )
 from ap_explanation.services.provenance import ProvenanceService
 from ap_explanation.types.semiring import DbSemiring
-from tests.conftest import TestSchema
+from tests._json import loads
+from tests._schema import TestSchema
 
 
-@pytest.mark.asyncio
 async def test_ok_compute_provenance_why_semiring(
     provenance_service: ProvenanceService,
     why_semiring: DbSemiring,
@@ -28,12 +27,11 @@ async def test_ok_compute_provenance_why_semiring(
 
     # Verify we got valid JSON with results
     assert result_json is not None
-    results = orjson.loads(result_json)
+    results = loads(result_json)
     assert len(results) == 1  # One result per semiring
     assert len(results[0]) > 0  # Has rows
 
 
-@pytest.mark.asyncio
 async def test_ok_compute_provenance_formula_semiring(
     provenance_service: ProvenanceService,
     formula_semiring: DbSemiring,
@@ -49,12 +47,11 @@ async def test_ok_compute_provenance_formula_semiring(
 
     # Verify we got valid JSON with results
     assert result_json is not None
-    results = orjson.loads(result_json)
+    results = loads(result_json)
     assert len(results) == 1  # One result per semiring
     assert len(results[0]) > 0  # Has rows
 
 
-@pytest.mark.asyncio
 async def test_ok_compute_provenance_with_all_semirings(
     provenance_service: ProvenanceService,
     all_semirings: List[DbSemiring],
@@ -70,11 +67,10 @@ async def test_ok_compute_provenance_with_all_semirings(
 
     # Verify we got results for all semirings
     assert result_json is not None
-    results = orjson.loads(result_json)
+    results = loads(result_json)
     assert len(results) == len(all_semirings)
 
 
-@pytest.mark.asyncio
 async def test_ok_compute_provenance_without_annotation(
     provenance_service: ProvenanceService,
     why_semiring: DbSemiring,
@@ -90,7 +86,6 @@ async def test_ok_compute_provenance_without_annotation(
     assert why_semiring.name in str(exc_info.value)
 
 
-@pytest.mark.asyncio
 async def test_ok_compute_provenance_with_aggregation(
     provenance_service: ProvenanceService,
     formula_semiring: DbSemiring,
@@ -106,12 +101,11 @@ async def test_ok_compute_provenance_with_aggregation(
 
     # Verify we got valid results
     assert result_json is not None
-    results = orjson.loads(result_json)
+    results = loads(result_json)
     assert len(results) == 1
     assert len(results[0]) > 0
 
 
-@pytest.mark.asyncio
 async def test_ko_aggregation_not_supported(
     provenance_service: ProvenanceService,
     why_semiring: DbSemiring,
@@ -0,0 +1,66 @@
+from typing import List, Optional
+
+import pytest
+from pydantic import ValidationError
+
+from ap_explanation.types.pg_json import PgJson, PgJsonEdge, PgJsonNode
+
+_GRAPH = PgJson.model_validate({
+    "nodes": [
+        {"id": "db", "labels": ["Relational_Database"]},
+        {"id": "t1", "labels": ["Table"]},
+        {"id": "t2", "labels": ["Table", "Table"]},
+        # Duplicated id, the first node wins
+        {"id": "t1", "labels": ["Table", "Duplicate"]},
+        {"id": "op", "labels": ["Provenance_SQL_Operator"], "properties": {"query": "SELECT 1"}},
+    ],
+    "edges": [
+        {"from": "db", "to": "t1", "labels": ["contains"]},
+        {"from": "db", "to": "t2", "labels": ["contains"]},
+        {"from": "op", "to": "t1", "labels": ["input"]},
+        {"from": "op", "to": "t1", "labels": ["input"]},
+    ],
+})
+
+
+# Linear scans the indexed accessors must agree with
+def _node_by_id(graph: PgJson, node_id: str) -> Optional[PgJsonNode]:
+    return next((n for n in graph.nodes if n.id == node_id), None)
+
+
+def _edges_from(graph: PgJson, node_id: str) -> List[PgJsonEdge]:
+    return [e for e in graph.edges if e.from_ == node_id]
+
+
+def _edges_to(graph: PgJson, node_id: str) -> List[PgJsonEdge]:
+    return [e for e in graph.edges if e.to == node_id]
+
+
+def _nodes_by_label(graph: PgJson, label: str) -> List[PgJsonNode]:
+    return [n for n in graph.nodes if label in n.labels]
+
+
+@pytest.mark.parametrize("node_id", ["db", "t1", "t2", "op", "missing"])
+def test_indexed_node_and_edge_lookups(node_id: str):
+    assert _GRAPH.get_node_by_id(node_id) is _node_by_id(_GRAPH, node_id)
+    assert _GRAPH.get_edges_from(node_id) == _edges_from(_GRAPH, node_id)
+    assert _GRAPH.get_edges_to(node_id) == _edges_to(_GRAPH, node_id)
+
+
+@pytest.mark.parametrize("label", ["Relational_Database", "Table", "Duplicate", "Provenance_SQL_Operator", "missing"])
+def test_indexed_label_lookup(label: str):
+    assert _GRAPH.get_nodes_by_label(label) == _nodes_by_label(_GRAPH, label)
+
+
+def test_lookups_follow_model_copy():
+    copied = _GRAPH.model_copy(update={"nodes": (), "edges": ()})
+
+    assert copied.get_node_by_id("t1") is None
+    assert copied.get_nodes_by_label("Table") == []
+    assert copied.get_edges_from("db") == []
+    assert _GRAPH.get_node_by_id("t1") is not None
+
+
+def test_graph_is_frozen():
+    with pytest.raises(ValidationError):
+        _GRAPH.nodes = ()  # type: ignore